@@ -1,36 +1,124 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import io
 import json
 import os
+import sys
 import zipfile
-from typing import Dict, Any, List, Tuple, Set
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple, Set
 from datetime import datetime, timedelta, timezone
 
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
+
+
 def load_coords_csv(path: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Load coordinates.csv as location_name -> (lat, lon).
+    Rows without a valid lat/lon are dropped here, once, so every name in the
+    result is a stop we can export.
+    """
     coords: Dict[str, Tuple[str, str]] = {}
     if not os.path.exists(path):
         return coords
     with open(path, "r", encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
+        # Fixed schema: resolve the column positions once instead of a dict per row.
+        # Like DictReader, a repeated header maps to its last column.
+        r = csv.reader(f)
+        col = {h: i for i, h in enumerate(next(r, []))}
+        try:
+            ni, li, oi = col["location_name"], col["lat"], col["lon"]
+        except KeyError:
+            # without all three columns no row has a usable coordinate
+            return coords
+        width = max(ni, li, oi) + 1
         for row in r:
-            name = (row.get("location_name") or "").strip()
-            lat = (row.get("lat") or "").strip()
-            lon = (row.get("lon") or "").strip()
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            name = row[ni].strip()
+            lat = row[li].strip()
+            lon = row[oi].strip()
             if not name:
                 continue
+            if not has_valid_coord(lat, lon):
+                # last row for a name wins, as before
+                coords.pop(name, None)
+                continue
             coords[name] = (lat, lon)
     return coords
 
 
 def load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
-def write_csv(path: str, header: List[str], rows: List[List[str]]) -> None:
-    with open(path, "w", encoding="utf-8", newline="") as f:
-        w = csv.writer(f)
+class PlainCsvWriter:
+    """
+    csv.writer stand-in for rows of plain ids / times: fields are joined directly,
+    and only a line that would actually need quoting goes through the csv module.
+    Output is identical to csv.writer (same \r\n terminator).
+    """
+
+    def __init__(self, f) -> None:
+        self._f = f
+        self._csv = csv.writer(f)
+
+    @staticmethod
+    def _plain_line(row: Sequence[str]) -> Optional[str]:
+        """row joined with commas, or None if a field would need csv quoting."""
+        line = ",".join(row)
+        if '"' in line or "\n" in line or "\r" in line or line.count(",") != len(row) - 1:
+            return None
+        return line
+
+    def writerow(self, row: Sequence[str]) -> None:
+        line = self._plain_line(row)
+        if line is None:
+            self._csv.writerow(row)
+        else:
+            self._f.write(line + "\r\n")
+
+    def writerows(self, rows: Iterable[Sequence[str]]) -> None:
+        # One write per batch (a trip's stop_times) instead of one per row
+        lines: List[str] = []
+        for row in rows:
+            line = self._plain_line(row)
+            if line is None:
+                if lines:
+                    self._f.write("\r\n".join(lines) + "\r\n")
+                    lines = []
+                self._csv.writerow(row)
+            else:
+                lines.append(line)
+        if lines:
+            self._f.write("\r\n".join(lines) + "\r\n")
+
+
+def open_zip_text(z: zipfile.ZipFile, name: str) -> io.TextIOWrapper:
+    """Text handle that writes straight into a new member of z (1 MiB buffered, no newline translation)."""
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = z.compression
+    info.external_attr = 0o100644 << 16
+    raw = io.BufferedWriter(z.open(info, "w"), buffer_size=1 << 20)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def write_zip_csv(z: zipfile.ZipFile, name: str, header: List[str], rows: Iterable[Sequence[str]], plain: bool = False) -> None:
+    """
+    Write one CSV member into z.
+    plain=True is for tables whose fields practically never need quoting (see PlainCsvWriter).
+    """
+    with open_zip_text(z, name) as f:
+        w = PlainCsvWriter(f) if plain else csv.writer(f)
         w.writerow(header)
         w.writerows(rows)
 
@@ -69,11 +157,14 @@ def main() -> None:
     ap.add_argument("--out-zip", required=True, help="Output GTFS zip path")
     ap.add_argument("--agency-name", default="Italo", help="agency_name")
     ap.add_argument("--agency-id", default="ITALO", help="agency_id")
+    ap.add_argument("--jobs", type=int, default=0, help="Processes used to parse normalized files (default: CPU count)")
     args = ap.parse_args()
 
     coords_by_name = load_coords_csv("coordinates.csv")
 
     service_id = f"SVC_{args.service_date}"
+    # fixed for the whole run; per-trip ids are just prefix + train + suffix
+    trip_id_suffix = f"_{args.service_date}"
     agency_id = args.agency_id
 
     # Service window: start at --service-date and run for 1 year (inclusive)
@@ -81,8 +172,10 @@ def main() -> None:
     today_utc = datetime.now(timezone.utc).date()
     end_date = (today_utc + timedelta(days=365)).strftime("%Y%m%d")
 
-    norm_files = [f for f in os.listdir(args.normalized_dir) if f.endswith(".normalized.json")]
-    if not norm_files:
+    # Full paths, sorted (same order as sorting by filename: they share the directory)
+    with os.scandir(args.normalized_dir) as it:
+        norm_paths = sorted(e.path for e in it if e.name.endswith(".normalized.json") and e.is_file())
+    if not norm_paths:
         raise SystemExit("No normalized files found")
 
     # stops: we only emit stops that are referenced by kept stop_times
@@ -90,13 +183,10 @@ def main() -> None:
     stops_rows: List[List[str]] = []
     seen_stop_ids: Set[str] = set()
 
-    # routes / trips / stop_times
-    routes_rows: List[List[str]] = []
-    trips_rows: List[List[str]] = []
-    stop_times_rows: List[List[str]] = []
-
-    # Track which routes actually have >=1 kept trip
-    used_route_ids: Set[str] = set()
+    # routes / trips (stop_times is streamed into the zip, see below)
+    # routes are keyed by route_id, and only trips we keep ever add one
+    routes_by_id: Dict[str, List[str]] = {}
+    trips_rows: List[Tuple[str, str, str, str]] = []
 
     # Minimal agency.txt
     agency_txt = [
@@ -113,20 +203,33 @@ def main() -> None:
         name = (name or "").strip()
         return code or name
 
+    # The same few dozen stations recur across every trip, so memoize the lookup
+    @lru_cache(maxsize=None)
     def coords_for_name(name: str) -> Tuple[str, str]:
         name = (name or "").strip()
         lat, lon = coords_by_name.get(name, ("", ""))
         return (lat, lon)
 
     def keep_stop(name: str) -> bool:
-        lat, lon = coords_for_name(name)
-        return has_valid_coord(lat, lon)
+        # coords_by_name only holds validated coordinates
+        return name in coords_by_name
+
+    # Raw (code, name) as seen in the trip loop -> stop_id, so the common case of an
+    # already-known stop is a single dict lookup with no re-stripping.
+    stop_id_by_raw: Dict[Tuple[str, str], str] = {}
 
     def ensure_stop(code: str, name: str) -> str:
         """
         Only called for stops we are keeping.
         Ensures the stop exists in stops_rows.
         """
+        raw = (code, name)
+        stop_id = stop_id_by_raw.get(raw)
+        if stop_id is None:
+            stop_id = stop_id_by_raw[raw] = resolve_stop(code, name)
+        return stop_id
+
+    def resolve_stop(code: str, name: str) -> str:
         key = stop_key(code, name)
         if not key:
             # Extremely defensive: should not happen, but keep deterministic output
@@ -135,7 +238,7 @@ def main() -> None:
         if key in stop_id_by_key:
             return stop_id_by_key[key]
 
-        stop_id = f"STOP_{key}"
+        stop_id = sys.intern(f"STOP_{key}")
         stop_id_by_key[key] = stop_id
 
         if stop_id not in seen_stop_ids:
@@ -145,10 +248,6 @@ def main() -> None:
             stop_code = (code or "").strip()
             lat, lon = coords_for_name(stop_name)
 
-            # At this point we expect valid coords; but keep defensive
-            if not has_valid_coord(lat, lon):
-                lat, lon = ("", "")
-
             stops_rows.append([stop_id, stop_name, lat, lon, stop_code])
 
         return stop_id
@@ -156,119 +255,103 @@ def main() -> None:
     dropped_stops_no_coords = 0
     dropped_trips_too_few_stops = 0
 
-    for fn in sorted(norm_files):
-        data = load_json(os.path.join(args.normalized_dir, fn))
+    os.makedirs(os.path.dirname(args.out_zip) or ".", exist_ok=True)
+    with zipfile.ZipFile(args.out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        # stop_times.txt is the one large table, so it is streamed straight into the archive
+        # while trips are processed. A zip accepts one open member at a time, so the small
+        # tables are kept in memory and written once the stream is closed.
+        # JSON parsing is fanned out to worker processes; results come back in filename
+        # order and everything that mutates the shared dicts stays on this process.
+        with open_zip_text(z, "stop_times.txt") as st_file, ProcessPoolExecutor(max_workers=args.jobs or None) as ex:
+            st_writer = PlainCsvWriter(st_file)
+            st_writer.writerow(["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"])
 
-        train = data["train_number"]
-        origin = data.get("origin_station") or ""
-        dest = data.get("destination_station") or ""
+            for data in ex.map(load_json, norm_paths, chunksize=32):
+                train = str(data["train_number"])
+                origin = data.get("origin_station") or ""
+                dest = data.get("destination_station") or ""
 
-        route_id = f"R_{train}"
-        trip_id = f"T_{train}_{args.service_date}"
+                # Interned: these ids repeat on every row of the trip
+                route_id = sys.intern("R_" + train)
+                trip_id = sys.intern("T_" + train + trip_id_suffix)
 
-        # Build stop_times for this trip, skipping stops without coords and reindexing sequences
-        kept_rows_for_trip: List[List[str]] = []
-        seq = 0
+                # Build stop_times for this trip, skipping stops without coords and reindexing sequences
+                kept_rows_for_trip: List[Tuple[str, str, str, str, str]] = []
+                seq = 0
 
-        kept_stop_names: List[str] = []
+                kept_stop_names: List[str] = []
 
-        for s in data.get("stops", []):
-            name = (s.get("stop_name") or "").strip()
-            code = (s.get("location_code") or "").strip()
+                for s in data.get("stops", []):
+                    name = (s.get("stop_name") or "").strip()
+                    code = (s.get("location_code") or "").strip()
 
-            if not name:
-                continue
+                    if not name:
+                        continue
 
-            if not keep_stop(name):
-                dropped_stops_no_coords += 1
-                continue
+                    if not keep_stop(name):
+                        dropped_stops_no_coords += 1
+                        continue
 
-            stop_id = ensure_stop(code, name)
-
-            kept_stop_names.append(name)
-
-            arr = s.get("arrival_time") or ""
-            dep = s.get("departure_time") or ""
-            arr, dep = normalize_arr_dep(arr, dep)
-
-            kept_rows_for_trip.append([trip_id, arr, dep, stop_id, str(seq)])
-            seq += 1
-
-        # If fewer than 2 stops remain, drop the entire trip (and thus its stop_times)
-        if len(kept_rows_for_trip) < 2:
-            dropped_trips_too_few_stops += 1
-            continue
-
-        # Keep trip
-        used_route_ids.add(route_id)
-
-        # routes.txt row is "one per train number", but only keep if used
-        # We'll append now and filter later, or just append only when used.
-        # Use first/last kept stop names to define route A–B (matches what we actually exported)
-        route_origin = kept_stop_names[0] if kept_stop_names else (origin or "")
-        route_dest = kept_stop_names[-1] if kept_stop_names else (dest or "")
-
-        routes_rows.append([route_id, agency_id, str(train), f"{route_origin} – {route_dest}", "2"])
-        trips_rows.append([route_id, service_id, trip_id, str(train)])
-        stop_times_rows.extend(kept_rows_for_trip)
-
-    # Filter routes_rows down to used routes (avoid duplicates too)
-    # routes_rows currently has one row per kept trip; dedupe by route_id
-    dedup_routes: Dict[str, List[str]] = {}
-    for r in routes_rows:
-        rid = r[0]
-        if rid in used_route_ids:
-            dedup_routes[rid] = r
-    routes_rows = [dedup_routes[rid] for rid in sorted(dedup_routes.keys())]
-
-    # Write txt files to a temp folder, zip them
-    tmp = os.path.join(args.normalized_dir, "__gtfs_tmp__")
-    os.makedirs(tmp, exist_ok=True)
-
-    write_csv(os.path.join(tmp, "agency.txt"), agency_txt[0], [agency_txt[1]])
-    write_csv(
-        os.path.join(tmp, "stops.txt"),
-        ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code"],
-        stops_rows,
-    )
-    write_csv(
-        os.path.join(tmp, "routes.txt"),
-        ["route_id", "agency_id", "route_short_name", "route_long_name", "route_type"],
-        routes_rows,
-    )
-    write_csv(
-        os.path.join(tmp, "trips.txt"),
-        ["route_id", "service_id", "trip_id", "trip_short_name"],
-        trips_rows,
-    )
-    write_csv(
-        os.path.join(tmp, "stop_times.txt"),
-        ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
-        stop_times_rows,
-    )
-    write_csv(
-        os.path.join(tmp, "calendar.txt"),
-        ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "start_date", "end_date"],
-        calendar_rows,
-    )
-    write_csv(
-        os.path.join(tmp, "feed_info.txt"),
-        ["feed_publisher_name", "feed_publisher_url", "feed_lang", "feed_start_date", "feed_end_date"],
-        [[args.agency_name, "https://www.italotreno.com/", "it", start_date, end_date]],
-    )
+                    stop_id = ensure_stop(code, name)
 
-    os.makedirs(os.path.dirname(args.out_zip) or ".", exist_ok=True)
-    with zipfile.ZipFile(args.out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
-        for name in [
-            "agency.txt",
+                    kept_stop_names.append(name)
+
+                    arr = s.get("arrival_time") or ""
+                    dep = s.get("departure_time") or ""
+                    arr, dep = normalize_arr_dep(arr, dep)
+
+                    kept_rows_for_trip.append((trip_id, arr, dep, stop_id, str(seq)))
+                    seq += 1
+
+                # If fewer than 2 stops remain, drop the entire trip (and thus its stop_times)
+                if len(kept_rows_for_trip) < 2:
+                    dropped_trips_too_few_stops += 1
+                    continue
+
+                # Keep trip
+                # routes.txt row is "one per train number" and only exists for kept trips.
+                # Use first/last kept stop names to define route A–B (matches what we actually exported)
+                route_origin = kept_stop_names[0] if kept_stop_names else (origin or "")
+                route_dest = kept_stop_names[-1] if kept_stop_names else (dest or "")
+
+                routes_by_id[route_id] = [route_id, agency_id, train, f"{route_origin} – {route_dest}", "2"]
+                trips_rows.append((route_id, service_id, trip_id, train))
+                st_writer.writerows(kept_rows_for_trip)
+
+        routes_rows = [routes_by_id[rid] for rid in sorted(routes_by_id)]
+
+        write_zip_csv(z, "agency.txt", agency_txt[0], [agency_txt[1]])
+        write_zip_csv(
+            z,
             "stops.txt",
+            ["stop_id", "stop_name", "stop_lat", "stop_lon", "stop_code"],
+            stops_rows,
+        )
+        write_zip_csv(
+            z,
             "routes.txt",
+            ["route_id", "agency_id", "route_short_name", "route_long_name", "route_type"],
+            routes_rows,
+        )
+        write_zip_csv(
+            z,
             "trips.txt",
-            "stop_times.txt",
+            ["route_id", "service_id", "trip_id", "trip_short_name"],
+            trips_rows,
+            plain=True,
+        )
+        write_zip_csv(
+            z,
             "calendar.txt",
+            ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "start_date", "end_date"],
+            calendar_rows,
+        )
+        write_zip_csv(
+            z,
             "feed_info.txt",
-        ]:
-            z.write(os.path.join(tmp, name), arcname=name)
+            ["feed_publisher_name", "feed_publisher_url", "feed_lang", "feed_start_date", "feed_end_date"],
+            [[args.agency_name, "https://www.italotreno.com/", "it", start_date, end_date]],
+        )
 
     print(f"Wrote {args.out_zip} with {len(trips_rows)} trips")
     print(f"Dropped stop_times rows (missing coords): {dropped_stops_no_coords}")
@@ -3,17 +3,52 @@ import argparse
 import csv
 import json
 import os
-from typing import Dict, Set, Tuple
+from typing import Any, Dict, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
 
 
 HEADER = ["location_name", "lat", "lon"]
 
 
 def iter_json_files(root: str):
-    for dirpath, _, filenames in os.walk(root):
-        for fn in filenames:
-            if fn.endswith(".json") and fn not in ("_summary.json",):
-                yield os.path.join(dirpath, fn)
+    # scandir's DirEntry carries the file type and full path, so no extra stat/join per file.
+    # Like os.walk, a missing or unreadable directory just yields nothing.
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                yield from iter_json_files(e.path)
+            elif e.name.endswith(".json") and e.name not in ("_summary.json", "_empty.json") and e.is_file():
+                yield e.path
+
+
+def load_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def iter_location_names(ts: Dict[str, Any]):
+    """Yield the raw LocationDescription values of one TrainSchedule (may be empty/None)."""
+    # start station
+    yield (ts.get("StazionePartenza") or {}).get("LocationDescription")
+
+    # stops
+    for k in ("StazioniFerme", "StazioniNonFerme"):
+        for s in (ts.get(k) or []):
+            yield (s or {}).get("LocationDescription")
+
+    # end station description (sometimes not in stop arrays)
+    yield ts.get("ArrivalStationDescription")
 
 
 def load_existing_coords(path: str) -> Dict[str, Tuple[str, str]]:
@@ -40,7 +75,7 @@ def load_existing_coords(path: str) -> Dict[str, Tuple[str, str]]:
 
 def write_coords(path: str, rows: Dict[str, Tuple[str, str]]) -> None:
     # stable alphabetical output (case-insensitive)
-    names = sorted(rows.keys(), key=lambda s: s.casefold())
+    names = sorted(rows.keys(), key=str.casefold)
 
     with open(path, "w", encoding="utf-8", newline="") as f:
         w = csv.writer(f)
@@ -64,8 +99,7 @@ def main():
 
     for path in iter_json_files(args.input_dir):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
+            raw = load_json(path)
         except Exception:
             continue
 
@@ -73,24 +107,12 @@ def main():
         if not ts:
             continue
 
-        def add_name(n):
+        for n in iter_location_names(ts):
             if n:
                 n = str(n).strip()
                 if n:
                     names.add(n)
 
-        # start station
-        sp = ts.get("StazionePartenza") or {}
-        add_name(sp.get("LocationDescription"))
-
-        # stops
-        for k in ("StazioniFerme", "StazioniNonFerme"):
-            for s in (ts.get(k) or []):
-                add_name((s or {}).get("LocationDescription"))
-
-        # end station description (sometimes not in stop arrays)
-        add_name(ts.get("ArrivalStationDescription"))
-
     # 3) merge: keep existing lat/lon, add blanks for new
     merged: Dict[str, Tuple[str, str]] = {}
     for name in names:
@@ -2,11 +2,23 @@
 import argparse
 import json
 import os
+import random
+import shutil
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple, List, Set
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
+
 
 API_TEMPLATE = "https://italoinviaggio.italotreno.com/api/RicercaTrenoService?&TrainNumber={train}"
 
@@ -22,21 +34,94 @@ def read_trains(path: str) -> List[str]:
     return trains
 
 
-def fetch_json(session: requests.Session, train: str, timeout: int, retries: int) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+def select_warm(trains: List[str], warm: Set[str], sample_empty: int) -> List[str]:
+    """
+    Keep trains that have returned a schedule before, plus a random probe of up to
+    sample_empty of the others so newly running trains are still discovered.
+    Order of the trains file is preserved.
+    """
+    cold = [t for t in trains if t not in warm]
+    probe = set(random.sample(cold, min(max(0, sample_empty), len(cold))))
+    return [t for t in trains if t in warm or t in probe]
+
+
+def update_warm_file(path: str, trains: List[str]) -> None:
+    """Union train numbers that returned a schedule into the warm list at path."""
+    known = set(read_trains(path)) if os.path.exists(path) else set()
+    merged = known | set(trains)
+    if merged == known:
+        return
+    ensure_dir(os.path.dirname(path) or ".")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{t}\n" for t in sorted(merged)))
+
+
+def make_session(workers: int, retries: int) -> requests.Session:
+    """
+    One keep-alive session for all workers: the adapter pool holds a connection per
+    worker, and transient failures are retried on the already-open connection.
+    pool_block caps the host at `workers` connections, so every TLS handshake is made
+    once and then reused instead of opening throwaway overflow connections.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=workers, pool_maxsize=workers, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0"
+    return session
+
+
+# fetch_json result: (payload, error, validators). validators holds the response's
+# etag / last_modified, to be sent back as a conditional GET on the next run.
+FetchResult = Tuple[Optional[Dict[str, Any]], Optional[str], Dict[str, str]]
+
+# Payload sentinel for "304 Not Modified": the previous run's file is still current
+NOT_MODIFIED: Dict[str, Any] = {}
+
+
+def fetch_json(session: requests.Session, train: str, timeout: int, validators: Optional[Dict[str, str]] = None) -> FetchResult:
     url = API_TEMPLATE.format(train=train)
-    last_err: Optional[str] = None
-    for attempt in range(retries + 1):
-        try:
-            r = session.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-            if r.status_code != 200:
-                last_err = f"HTTP {r.status_code}"
-                time.sleep(0.4 + 0.5 * attempt)
-                continue
-            return r.json(), None
-        except Exception as e:
-            last_err = str(e)
-            time.sleep(0.4 + 0.5 * attempt)
-    return None, last_err
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    try:
+        r = session.get(url, timeout=timeout, headers=headers)
+        if r.status_code == 304 and validators:
+            return NOT_MODIFIED, None, validators
+        if r.status_code != 200:
+            return None, f"HTTP {r.status_code}", {}
+        got = {"etag": r.headers.get("ETag") or "", "last_modified": r.headers.get("Last-Modified") or ""}
+        return r.json(), None, got
+    except requests.RequestException as e:
+        return None, str(e), {}
+
+
+# Per-worker-thread pacing state (next_ready, a time.monotonic() value)
+_pace = threading.local()
+
+
+def fetch_paced(session: requests.Session, train: str, timeout: int, sleep: float, jitter: float, validators: Optional[Dict[str, str]] = None) -> FetchResult:
+    """
+    fetch_json with per-worker politeness pacing: a worker starts a request at most once
+    every sleep + jitter seconds. The schedule is monotonic, so time already spent on the
+    previous request counts toward the interval instead of being slept on top of it.
+    """
+    now = time.monotonic()
+    next_ready = getattr(_pace, "next_ready", now)
+    if now < next_ready:
+        time.sleep(next_ready - now)
+        now = next_ready
+    _pace.next_ready = now + sleep + random.random() * jitter
+    return fetch_json(session, train, timeout=timeout, validators=validators)
 
 
 def ensure_dir(p: str) -> None:
@@ -44,10 +129,38 @@ def ensure_dir(p: str) -> None:
 
 
 def write_json(path: str, payload: Dict[str, Any]) -> None:
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
 
+def load_etags(path: str) -> Dict[str, Dict[str, str]]:
+    """
+    Conditional-GET state: train -> {"etag", "last_modified", "file"}, where file is the
+    payload written by the run those validators came from.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
 def slice_list(items: List[str], slice_size: int, slice_index: int) -> List[str]:
     if slice_size <= 0:
         raise ValueError("slice_size must be > 0")
@@ -57,6 +170,9 @@ def slice_list(items: List[str], slice_size: int, slice_index: int) -> List[str]
     idx = slice_index % num_slices
     start = idx * slice_size
     end = min(len(items), start + slice_size)
+    if start == 0 and end == len(items):
+        # single slice covering everything (the CI setup): no copy needed
+        return items
     return items[start:end]
 
 
@@ -71,11 +187,26 @@ def main() -> None:
     ap.add_argument("--skip-empty", action="store_true")
     ap.add_argument("--sleep", type=float, default=0.15)
     ap.add_argument("--jitter", type=float, default=0.20)
+    ap.add_argument("--workers", type=int, default=8, help="Concurrent HTTP requests.")
+    ap.add_argument("--warm-file", default="",
+                    help="Train numbers that have ever returned a schedule, updated after each run "
+                         "(e.g. state/nonempty_trains.txt; off by default).")
+    ap.add_argument("--warm-only", action="store_true",
+                    help="Only scrape trains listed in --warm-file (plus --sample-empty probes), if it exists.")
+    ap.add_argument("--sample-empty", type=int, default=10,
+                    help="With --warm-only, also probe this many random trains not in the warm list.")
+    ap.add_argument("--etags-file", default="",
+                    help="ETag/Last-Modified per train for conditional GETs "
+                         "(e.g. state/etags.json; off by default).")
     args = ap.parse_args()
 
     trains_all = read_trains(args.trains_file)
     if not trains_all:
         raise SystemExit(f"No trains found in {args.trains_file}")
+    trains_in_file = len(trains_all)
+
+    if args.warm_only and args.warm_file and os.path.exists(args.warm_file):
+        trains_all = select_warm(trains_all, set(read_trains(args.warm_file)), args.sample_empty)
 
     trains = slice_list(trains_all, args.slice_size, args.slice_index)
 
@@ -83,40 +214,79 @@ def main() -> None:
     run_dir = os.path.join(args.outdir, run_ts)
     ensure_dir(run_dir)
 
-    session = requests.Session()
-    stats = {"ok": 0, "empty": 0, "error": 0}
-
-    import random
-    for train in trains:
-        payload, err = fetch_json(session, train, timeout=args.timeout, retries=args.retries)
-
-        if payload is None:
-            stats["error"] += 1
-            write_json(os.path.join(run_dir, f"{train}.error.json"), {"train": train, "error": err})
-        else:
-            is_empty = bool(payload.get("IsEmpty", False))
-            if is_empty:
-                stats["empty"] += 1
-                if not args.skip_empty:
-                    write_json(os.path.join(run_dir, f"{train}.json"), payload)
-            else:
+    workers = max(1, args.workers)
+    session = make_session(workers, args.retries)
+    stats = {"ok": 0, "empty": 0, "error": 0, "not_modified": 0}
+    ok_trains: List[str] = []
+
+    empty_path = os.path.join(run_dir, "_empty.json")
+    empty_payload: Optional[Dict[str, Any]] = None
+
+    # Only ask for a 304 when the payload it would point back to is still on disk
+    etags = load_etags(args.etags_file)
+    reusable = {t: v for t, v in etags.items() if os.path.exists(v.get("file") or "")}
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {
+            ex.submit(fetch_paced, session, train, args.timeout, args.sleep, args.jitter, reusable.get(train)): train
+            for train in trains
+        }
+
+        # Bookkeeping stays on the main thread, so stats needs no lock
+        for fut in as_completed(futures):
+            train = futures[fut]
+            payload, err, validators = fut.result()
+            out_path = os.path.join(run_dir, f"{train}.json")
+
+            if payload is NOT_MODIFIED:
                 stats["ok"] += 1
-                write_json(os.path.join(run_dir, f"{train}.json"), payload)
+                stats["not_modified"] += 1
+                ok_trains.append(train)
+                link_or_copy(reusable[train]["file"], out_path)
+                etags[train] = dict(reusable[train], file=out_path)
+            elif payload is None:
+                stats["error"] += 1
+                write_json(os.path.join(run_dir, f"{train}.error.json"), {"train": train, "error": err})
+            else:
+                is_empty = bool(payload.get("IsEmpty", False))
+                if is_empty:
+                    stats["empty"] += 1
+                    if not args.skip_empty:
+                        # Empty replies are (nearly always) identical: write one canonical copy
+                        # per run and hard-link each train's file to it.
+                        if empty_payload is None:
+                            empty_payload = payload
+                            write_json(empty_path, payload)
+                        if payload == empty_payload:
+                            link_or_copy(empty_path, out_path)
+                        else:
+                            write_json(out_path, payload)
+                else:
+                    stats["ok"] += 1
+                    ok_trains.append(train)
+                    write_json(out_path, payload)
+                    if validators.get("etag") or validators.get("last_modified"):
+                        etags[train] = dict(validators, file=out_path)
 
-        time.sleep(args.sleep + random.random() * args.jitter)
+    if args.warm_file:
+        update_warm_file(args.warm_file, ok_trains)
+    if args.etags_file and (etags or os.path.exists(args.etags_file)):
+        ensure_dir(os.path.dirname(args.etags_file) or ".")
+        with open(args.etags_file, "w", encoding="utf-8") as f:
+            json.dump(etags, f, ensure_ascii=False, indent=2, sort_keys=True)
 
     write_json(os.path.join(run_dir, "_summary.json"), {
         "run_utc": run_ts,
         "slice_size": args.slice_size,
         "slice_index": args.slice_index,
-        "total_trains_in_file": len(trains_all),
+        "total_trains_in_file": trains_in_file,
         "total_trains_this_run": len(trains),
         "slice_first": trains[0] if trains else None,
         "slice_last": trains[-1] if trains else None,
         "counts": stats,
     })
 
-    print(f"Done {run_ts}: OK={stats['ok']} EMPTY={stats['empty']} ERROR={stats['error']} checked={len(trains)}")
+    print(f"Done {run_ts}: OK={stats['ok']} (not modified={stats['not_modified']}) EMPTY={stats['empty']} ERROR={stats['error']} checked={len(trains)}")
 
 
 if __name__ == "__main__":
@@ -2,12 +2,63 @@
 import argparse
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict
+
+
+def place_file(src: Path, dst: Path) -> None:
+    """
+    Put src's contents at dst (overwriting) as cheaply as the filesystem allows:
+    a hard link (metadata only), else an in-kernel copy_file_range (reflink on
+    btrfs/XFS), else a regular shutil.copy2. Every path goes through dst.tmp and
+    os.replace, so a dst still linked to an older run's file is never written through.
+    """
+    try:
+        if dst.exists() and os.path.samefile(src, dst):
+            return  # already linked from an earlier merge; rename(2) onto the same inode is a no-op
+    except OSError:
+        pass
+
+    tmp = dst.with_name(dst.name + ".tmp")
+    try:
+        if os.path.lexists(tmp):
+            tmp.unlink()
+        try:
+            os.link(src, tmp)
+        except OSError:
+            # e.g. EXDEV (different device) or no hard link support
+            copy_contents(src, tmp)
+        os.replace(tmp, dst)  # atomic overwrite of an existing dst
+    finally:
+        if os.path.lexists(tmp):
+            tmp.unlink()
+
+
+def copy_contents(src: Path, dst: Path) -> None:
+    """Copy src to a fresh dst: copy_file_range when the kernel supports it, else shutil.copy2."""
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            pass  # e.g. ENOTSUP / EXDEV on older kernels
+
+    shutil.copy2(src, dst)
+
 
 def main() -> None:
     ap = argparse.ArgumentParser(description="Merge normalized/<RUN_UTC>/*.normalized.json into normalized_latest/")
     ap.add_argument("--normalized-root", default="normalized", help="Root folder containing run dirs (default: normalized)")
     ap.add_argument("--out-dir", default="normalized_latest", help="Output folder (default: normalized_latest)")
+    ap.add_argument("--workers", type=int, default=32, help="Concurrent file copies (default: 32)")
     args = ap.parse_args()
 
     normalized_root = Path(args.normalized_root)
@@ -16,23 +67,30 @@ def main() -> None:
     if not normalized_root.exists() or not normalized_root.is_dir():
         raise SystemExit(f"Missing or invalid --normalized-root: {normalized_root}")
 
+    # Names present in out_dir, kept up to date during the merge (no rescan at the end)
+    existing = {p.name for p in out_dir.glob("*.normalized.json")} if out_dir.is_dir() else set()
     out_dir.mkdir(parents=True, exist_ok=True)
 
     run_dirs = sorted([p for p in normalized_root.iterdir() if p.is_dir()])
     if not run_dirs:
         raise SystemExit(f"No run directories found under {normalized_root}")
 
-    copied = 0
+    # Resolve the winning source per output name first (later runs override earlier ones),
+    # so the copies are independent and can run concurrently.
+    latest: Dict[str, Path] = {}
     for run in run_dirs:
-        files = list(run.glob("*.normalized.json"))
-        for src in files:
-            dst = out_dir / src.name
-            shutil.copy2(src, dst)  # overwrite if exists
-            copied += 1
+        for src in run.glob("*.normalized.json"):
+            latest[src.name] = src
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futures = [ex.submit(place_file, src, out_dir / name) for name, src in latest.items()]
+        for fut in as_completed(futures):
+            fut.result()  # overwrite if exists; re-raises copy errors
+    existing.update(latest)
 
     # Count unique trains in output
-    unique = len(list(out_dir.glob("*.normalized.json")))
-    print(f"Merged {len(run_dirs)} runs; copied {copied} files; normalized_latest now has {unique} files")
+    unique = len(existing)
+    print(f"Merged {len(run_dirs)} runs; copied {len(latest)} files; normalized_latest now has {unique} files")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
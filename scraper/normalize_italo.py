@@ -1,21 +1,44 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import operator
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
 
-TIME_RE = re.compile(r"^\d{2}:\d{2}$")
 
+# Per-stop fields read from the raw payload, in the order the extraction loop unpacks them
+STOP_FIELDS = (
+    "EstimatedArrivalTime",
+    "EstimatedDepartureTime",
+    "LocationDescription",
+    "LocationCode",
+    "RfiLocationCode",
+)
+_get_stop_fields = operator.itemgetter(*STOP_FIELDS)
+
+
+def stop_fields(s: Dict[str, Any]) -> Tuple[Any, ...]:
+    """STOP_FIELDS values of one raw stop in a single C call; missing keys come back as None."""
+    try:
+        return _get_stop_fields(s)
+    except KeyError:
+        return tuple(map(s.get, STOP_FIELDS))
 
 def parse_hhmm(s: Optional[str]) -> Optional[int]:
     """Return minutes since 00:00 for HH:MM, else None."""
-    if not s or not TIME_RE.match(s):
+    # fixed 5-char shape: check it directly instead of going through a regex + split + int()
+    if not s or len(s) != 5 or s[2] != ":" or not s.isascii():
+        return None
+    if not (s[:2].isdigit() and s[3:].isdigit()):
         return None
-    hh, mm = s.split(":")
-    return int(hh) * 60 + int(mm)
+    return (ord(s[0]) - 48) * 600 + (ord(s[1]) - 48) * 60 + (ord(s[3]) - 48) * 10 + (ord(s[4]) - 48)
 
 
 def fmt_gtfs_time(minutes: Optional[int]) -> Optional[str]:
@@ -27,40 +50,67 @@ def fmt_gtfs_time(minutes: Optional[int]) -> Optional[str]:
     return f"{hh:02d}:{mm:02d}:00"
 
 
-def infer_rollover_minutes(times: List[Optional[int]]) -> List[Optional[int]]:
+def parse_times_with_rollover(
+    times: Sequence[Tuple[Optional[str], Optional[str]]],
+) -> Tuple[List[Optional[int]], List[Optional[int]]]:
     """
-    If times go backwards (e.g. 23:50 -> 00:10), assume midnight rollover and add +24h from that point.
-    Works on minutes list in stop sequence order.
+    Parse raw (arrival, departure) HH:MM strings, in stop sequence order, into
+    (arrival_minutes, departure_minutes) lists with midnight rollover applied, in one pass.
+    Unparseable times come back as None. If arrivals (or departures) go backwards
+    (e.g. 23:50 -> 00:10), assume midnight rollover and add +24h from that point; each series
+    is tracked on its own. Per stop, a departure earlier than the arrival is also assumed to
+    have rolled over (that fixup doesn't carry into later stops).
     """
-    out: List[Optional[int]] = []
-    offset = 0
-    prev: Optional[int] = None
-    for t in times:
-        if t is None:
-            out.append(None)
-            continue
-        val = t + offset
-        if prev is not None and val < prev:
-            # rollover
-            offset += 1440
-            val = t + offset
-        out.append(val)
-        prev = val
-    return out
+    arr_out: List[Optional[int]] = []
+    dep_out: List[Optional[int]] = []
+    arr_offset = dep_offset = 0
+    prev_arr = prev_dep = -1  # parsed minutes are never negative, so no None check is needed
+    for arr_s, dep_s in times:
+        a = parse_hhmm(arr_s)
+        if a is not None:
+            a += arr_offset
+            if a < prev_arr:
+                # rollover
+                arr_offset += 1440
+                a += 1440
+            prev_arr = a
+
+        d = parse_hhmm(dep_s)
+        if d is not None:
+            d += dep_offset
+            if d < prev_dep:
+                # rollover
+                dep_offset += 1440
+                d += 1440
+            prev_dep = d
+            if a is not None and d < a:
+                d += 1440
+
+        arr_out.append(a)
+        dep_out.append(d)
+    return arr_out, dep_out
 
 
 def load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can catch the latter
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 
 def write_json(path: str, payload: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # the caller creates the output directory once (main does it before the loop)
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
 
-def extract_stops_from_train_schedule(raw: Dict[str, Any], train: str) -> Optional[Dict[str, Any]]:
+def extract_stops_from_train_schedule(
+    raw: Dict[str, Any], train: str, captured_utc: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
     if not raw or raw.get("IsEmpty") or not raw.get("TrainSchedule"):
         return None
 
@@ -87,29 +137,20 @@ def extract_stops_from_train_schedule(raw: Dict[str, Any], train: str) -> Option
         except Exception:
             return 10**9
 
-    stops_raw.sort(key=station_num)
+    # parse each StationNumber once; the sorted keys double as the stop sequence below
+    nums = [station_num(s) for s in stops_raw]
+    order = sorted(range(len(stops_raw)), key=nums.__getitem__)
+    stops_raw = [stops_raw[i] for i in order]
+    nums = [nums[i] for i in order]
 
-    # Extract estimated times
-    arr_mins = [parse_hhmm(s.get("EstimatedArrivalTime")) for s in stops_raw]
-    dep_mins = [parse_hhmm(s.get("EstimatedDepartureTime")) for s in stops_raw]
+    fields = [stop_fields(s) for s in stops_raw]
 
-    # Apply rollover inference separately for arr/dep
-    arr_mins2 = infer_rollover_minutes(arr_mins)
-    dep_mins2 = infer_rollover_minutes(dep_mins)
-
-    # Ensure per-stop consistency: if both times exist and departure < arrival, assume it rolled over
-    for i in range(len(stops_raw)):
-        a = arr_mins2[i]
-        d = dep_mins2[i]
-        if a is not None and d is not None and d < a:
-            dep_mins2[i] = d + 1440
+    # Estimated arrival/departure strings -> minutes with midnight rollover applied
+    arr_mins2, dep_mins2 = parse_times_with_rollover([f[:2] for f in fields])
 
     stops: List[Dict[str, Any]] = []
-    for i, s in enumerate(stops_raw):
-        seq = station_num(s)
-        name = s.get("LocationDescription")
-        code = s.get("LocationCode")
-        rfi = s.get("RfiLocationCode")
+    for i, seq in enumerate(nums):
+        _, _, name, code, rfi = fields[i]
 
         arr_out = fmt_gtfs_time(arr_mins2[i])
         dep_out = fmt_gtfs_time(dep_mins2[i])
@@ -135,7 +176,7 @@ def extract_stops_from_train_schedule(raw: Dict[str, Any], train: str) -> Option
     return {
         "train_number": train,
         "last_update": raw.get("LastUpdate"),
-        "captured_utc": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "captured_utc": captured_utc or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
         "origin_station": ts.get("DepartureStationDescription"),
         "destination_station": ts.get("ArrivalStationDescription"),
         "origin_code": ts.get("DepartureStation"),
@@ -144,10 +185,32 @@ def extract_stops_from_train_schedule(raw: Dict[str, Any], train: str) -> Option
     }
 
 
+def process_one(job: Tuple[str, str, str, str]) -> str:
+    """Normalize one raw file; returns the stats key to increment. Runs in a worker process."""
+    in_path, out_dir, train, captured_utc = job
+    out_path = os.path.join(out_dir, f"{train}.normalized.json")
+
+    try:
+        raw = load_json(in_path)
+        normalized = extract_stops_from_train_schedule(raw, train, captured_utc)
+        if not normalized:
+            return "skipped_empty"
+        write_json(out_path, normalized)
+        return "normalized"
+    except json.JSONDecodeError:
+        return "skipped_nonjson"
+    except Exception as e:
+        # optional: write an error marker
+        err_path = os.path.join(out_dir, f"{train}.error.json")
+        write_json(err_path, {"train": train, "error": str(e)})
+        return "errors"
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Normalize Italo italoinviaggio raw JSON to schedule JSON (estimated only).")
     ap.add_argument("--input-dir", required=True, help="Directory containing raw train JSON files (e.g., out/<run>/)")
     ap.add_argument("--output-dir", required=True, help="Directory to write normalized JSON (e.g., normalized/<run>/)")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
     args = ap.parse_args()
 
     in_dir = args.input_dir
@@ -156,31 +219,21 @@ def main() -> None:
 
     stats = {"normalized": 0, "skipped_empty": 0, "skipped_nonjson": 0, "errors": 0}
 
-    for fname in os.listdir(in_dir):
-        if not fname.endswith(".json"):
-            continue
-        if fname == "_summary.json":
-            continue
-
-        train = fname.replace(".json", "")
-        in_path = os.path.join(in_dir, fname)
-        out_path = os.path.join(out_dir, f"{train}.normalized.json")
-
-        try:
-            raw = load_json(in_path)
-            normalized = extract_stops_from_train_schedule(raw, train)
-            if not normalized:
-                stats["skipped_empty"] += 1
-                continue
-            write_json(out_path, normalized)
-            stats["normalized"] += 1
-        except json.JSONDecodeError:
-            stats["skipped_nonjson"] += 1
-        except Exception as e:
-            stats["errors"] += 1
-            # optional: write an error marker
-            err_path = os.path.join(out_dir, f"{train}.error.json")
-            write_json(err_path, {"train": train, "error": str(e)})
+    # one capture timestamp for the whole batch
+    captured_utc = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    with os.scandir(in_dir) as it:
+        jobs = [
+            (entry.path, out_dir, entry.name[:-5], captured_utc)  # strip ".json"
+            for entry in it
+            # "_"-prefixed files (_summary.json, _empty.json) are run bookkeeping, not trains;
+            # the scraper's {train}.error.json markers are failed fetches, not schedules, so skip them
+            if entry.name.endswith(".json") and entry.name[0] != "_" and not entry.name.endswith(".error.json")
+        ]
+
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as ex:
+        for key in ex.map(process_one, jobs, chunksize=32):
+            stats[key] += 1
 
     write_json(os.path.join(out_dir, "_summary.json"), stats)
     print(stats)
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import functools
+import io
+import operator
 import os
-import re
 import zipfile
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Tuple, Optional
+
+
+_EMPTY: FrozenSet[str] = frozenset()
 
 
 def pick_train_col(headers: List[str]) -> Optional[str]:
@@ -24,16 +29,18 @@ def pick_train_col(headers: List[str]) -> Optional[str]:
         "train",
     }
 
-    for h in headers:
-        if h and h.strip().lower() in candidates:
-            return h
-
+    # one scan: an exact (stripped, lowered) match wins; else the first whitespace-collapsed match
+    collapsed_match: Optional[str] = None
     for h in headers:
         if not h:
             continue
-        hn = re.sub(r"\s+", " ", h.strip().lower())
-        if hn in candidates:
+        hl = h.strip().lower()
+        if hl in candidates:
             return h
+        if collapsed_match is None and " ".join(hl.split()) in candidates:
+            collapsed_match = h
+    if collapsed_match is not None:
+        return collapsed_match
 
     if len(headers) >= 3:
         return headers[2]
@@ -46,62 +53,67 @@ def pretty_trains(s: str) -> str:
     return ", ".join(parts)
 
 
+@functools.lru_cache(maxsize=4096)
 def norm(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip().lower())
+    # split()/join collapses whitespace runs and strips, like re.sub(r"\s+", " ", s.strip())
+    return " ".join(s.lower().split()) if s else ""
 
 
-def read_gtfs_routes_from_zip(zip_path: str) -> List[Dict[str, str]]:
+def read_gtfs_routes_from_zip(zip_path: str) -> Iterator[Dict[str, str]]:
+    """Yield routes.txt rows as dicts, streamed from the zip (checks run on first iteration)."""
     if not os.path.exists(zip_path):
         raise SystemExit(f"GTFS zip not found: {zip_path}")
 
     with zipfile.ZipFile(zip_path, "r") as z:
         if "routes.txt" not in z.namelist():
             raise SystemExit(f"routes.txt not found inside: {zip_path}")
-        raw = z.read("routes.txt").decode("utf-8", "replace").splitlines()
-
-    if not raw:
-        return []
-
-    header = [h.strip() for h in raw[0].split(",")]
-    rows: List[Dict[str, str]] = []
-
-    for line in raw[1:]:
-        parts = line.split(",")
-        if len(parts) < len(header):
-            parts += [""] * (len(header) - len(parts))
-        d = {header[i]: (parts[i] if i < len(parts) else "") for i in range(len(header))}
-        rows.append(d)
-
-    return rows
-
-
+        with z.open("routes.txt") as raw, io.TextIOWrapper(
+            io.BufferedReader(raw, buffer_size=1 << 16), encoding="utf-8", errors="replace", newline=""
+        ) as text:
+            # csv.DictReader streams from the decompressor (64 KiB refills) and handles quoted commas
+            reader = csv.DictReader(text, restval="")  # restval pads short rows
+            if not reader.fieldnames:
+                return
+            reader.fieldnames = [h.strip() for h in reader.fieldnames]
+            yield from reader
+
+
+@functools.lru_cache(maxsize=4096)
 def parse_route_long_name(route_long_name: str) -> Tuple[str, str]:
     s = (route_long_name or "").strip()
-    if " – " in s:
-        a, b = s.split(" – ", 1)
-        return a.strip(), b.strip()
-    if " - " in s:
-        a, b = s.split(" - ", 1)
+    a, sep, b = s.partition(" – ")  # en dash is what build_gtfs writes
+    if not sep:
+        a, sep, b = s.partition(" - ")
+    if sep:
         return a.strip(), b.strip()
-    return s.strip(), ""
+    return s, ""
+
+
+class ExpectedRow(NamedTuple):
+    departure: str
+    arrival: str
+    trains: FrozenSet[str]
 
 
-def load_expected_csv(path: str) -> List[Dict[str, str]]:
+def load_expected_csv(path: str) -> List[ExpectedRow]:
     if not os.path.exists(path):
         raise SystemExit(f"Expected routes csv not found: {path}")
 
     with open(path, "r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        headers = reader.fieldnames or []
+        reader = csv.reader(f)
+        headers = next(reader, [])
 
         dep_keys = ["Departure_mapped", "From_mapped", "Departure", "From"]
         arr_keys = ["Arrival_mapped", "To_mapped", "Arrival", "To"]
 
+        # built once, shared by both pick_col calls
+        header_set = set(headers)
+        lower_map = {h.lower(): h for h in headers if h}
+
         def pick_col(keys: List[str]) -> Optional[str]:
             for k in keys:
-                if k in headers:
+                if k in header_set:
                     return k
-            lower_map = {h.lower(): h for h in headers if h}
             for k in keys:
                 hk = lower_map.get(k.lower())
                 if hk:
@@ -115,27 +127,38 @@ def load_expected_csv(path: str) -> List[Dict[str, str]]:
         if not dep_col or not arr_col:
             raise SystemExit(f"Expected file must contain Departure/Arrival columns.")
 
-        out: List[Dict[str, str]] = []
+        # positional access; like DictReader, a repeated header name resolves to its last column
+        col_index = {h: i for i, h in enumerate(headers)}
+        dep_i = col_index[dep_col]
+        arr_i = col_index[arr_col]
+        # the trains column is optional: pick the extractor once instead of testing it per row
+        if trains_col:
+            trains_i = col_index[trains_col]
+            get_fields = operator.itemgetter(dep_i, arr_i, trains_i)
+        else:
+            trains_i = 0
+            get_fields = lambda row: (row[dep_i], row[arr_i], "")
+        width = max(dep_i, arr_i, trains_i) + 1
+
+        out: List[ExpectedRow] = []
         for row in reader:
-            dep = (row.get(dep_col) or "").strip()
-            arr = (row.get(arr_col) or "").strip()
+            if len(row) < width:
+                row += [""] * (width - len(row))  # short row: missing cells read as ""
+            dep, arr, exp_trains = get_fields(row)
+            dep = dep.strip()
+            arr = arr.strip()
             if not dep and not arr:
                 continue
 
-            exp_trains = (row.get(trains_col) or "").strip() if trains_col else ""
-            exp_trains = pretty_trains(exp_trains)
+            exp_trains = pretty_trains(exp_trains.strip())
 
-            out.append({
-                "departure": dep,
-                "arrival": arr,
-                "expected_trains": exp_trains
-            })
+            # pretty_trains already stripped the parts and dropped empties
+            out.append(ExpectedRow(dep, arr, frozenset(exp_trains.split(", ")) if exp_trains else _EMPTY))
 
         return out
 
 
-@dataclass
-class MatchRow:
+class MatchRow(NamedTuple):
     departure: str
     arrival: str
     status: str
@@ -146,6 +169,9 @@ class MatchRow:
     present_elsewhere: str
     extra_gtfs_trains: str
 
+# report column order (CSV header); same as the MatchRow field order
+MATCH_FIELDS = MatchRow._fields
+
 
 def main() -> None:
     ap = argparse.ArgumentParser()
@@ -153,53 +179,85 @@ def main() -> None:
     ap.add_argument("--gtfs-zip", required=True)
     ap.add_argument("--out-dir", required=True)
     ap.add_argument("--out-prefix", default="missing_routes")
+    ap.add_argument("--debug", action="store_true", help="Print norm/parse cache statistics")
     args = ap.parse_args()
 
     os.makedirs(args.out_dir, exist_ok=True)
 
     expected = load_expected_csv(args.expected_csv)
-    gtfs_routes = read_gtfs_routes_from_zip(args.gtfs_zip)
 
-    # Global train index
-    train_to_longnames: Dict[str, set] = {}
-    for r in gtfs_routes:
-        t = (r.get("route_short_name","") or "").strip()
+    # One pass over the streamed routes builds both indexes:
+    # the global train index, and the A→B index keyed by small int ids of the normalized station names
+    # (defaultdicts: later code only reads them with `in`/.get, so nothing gets inserted by accident)
+    train_to_longnames: Dict[str, set] = defaultdict(set)
+    station_id: Dict[str, int] = {}
+    idx: Dict[Tuple[int,int], List[str]] = defaultdict(list)
+    key_cache: Dict[str, Tuple[int,int]] = {}  # route_long_name -> idx key; long names repeat a lot
+    for r in read_gtfs_routes_from_zip(args.gtfs_zip):
+        short = (r.get("route_short_name","") or "").strip()
         ln = (r.get("route_long_name","") or "").strip()
-        if t:
-            train_to_longnames.setdefault(t, set()).add(ln)
+        if short:
+            train_to_longnames[short].add(ln)
 
-    # A→B index
-    idx: Dict[Tuple[str,str], List[str]] = {}
-    for r in gtfs_routes:
-        ln = r.get("route_long_name","") or ""
-        short = (r.get("route_short_name","") or "").strip()
-        a,b = parse_route_long_name(ln)
-        key = (norm(a), norm(b))
-        idx.setdefault(key, []).append(short)
+        key = key_cache.get(ln)  # parse_route_long_name strips, so the stripped name gives the same key
+        if key is None:
+            a,b = parse_route_long_name(ln)
+            key = (station_id.setdefault(norm(a), len(station_id)), station_id.setdefault(norm(b), len(station_id)))
+            key_cache[ln] = key
+        idx[key].append(short)
 
-    results: List[MatchRow] = []
+    # freeze once so each expected-row lookup yields a ready-made set
+    found_by_ab: Dict[Tuple[int,int], FrozenSet[str]] = {k: frozenset(v) for k, v in idx.items()}
+
+    # set differences against a real set iterate only the (small) expected side;
+    # a dict keys view on the right would be walked in full for every row
+    gtfs_trains = frozenset(train_to_longnames)
 
-    for e in expected:
-        dep = e["departure"]
-        arr = e["arrival"]
-        expected_set = set([t.strip() for t in e["expected_trains"].split(",") if t.strip()])
+    # train -> " | "-joined sorted long names, built once (trains recur across expected rows)
+    longnames_joined: Dict[str, str] = {t: " | ".join(sorted(lns)) for t, lns in train_to_longnames.items()}
 
-        key = (norm(dep), norm(arr))
-        found_under_ab = set(idx.get(key, []))
+    # ", "-joined sorted trains per distinct train set; expected rows and A→B hits repeat the same sets
+    joined_cache: Dict[FrozenSet[str], str] = {}
+
+    def sorted_join(trains: FrozenSet[str]) -> str:
+        joined = joined_cache.get(trains)
+        if joined is None:
+            joined = joined_cache[trains] = ", ".join(sorted(trains))
+        return joined
+
+    results: List[MatchRow] = []
+    # (dep id, arr id, expected trains) -> computed row; duplicate expected rows reuse it
+    matched: Dict[Tuple[int,int,FrozenSet[str]], MatchRow] = {}
+
+    for dep, arr, expected_set in expected:
+
+        # a station GTFS never mentions can't have any A→B route (-1 is never an id),
+        # so all such rows with the same trains share one (-1, -1) result
+        dep_id = station_id.get(norm(dep), -1)
+        arr_id = station_id.get(norm(arr), -1)
+        if dep_id < 0 or arr_id < 0:
+            dep_id = arr_id = -1
+
+        match_key = (dep_id, arr_id, expected_set)
+        row = matched.get(match_key)
+        if row is not None:
+            # only the displayed names can differ (spacing/case)
+            results.append(row._replace(departure=dep, arrival=arr))
+            continue
+
+        found_under_ab = found_by_ab.get((dep_id, arr_id), _EMPTY)
 
         # Missing completely
-        missing_anywhere = sorted([t for t in expected_set if t not in train_to_longnames])
+        missing_anywhere = sorted(expected_set - gtfs_trains)
 
         # Missing only under this AB
-        missing_under_this_ab = sorted([t for t in expected_set if t not in found_under_ab])
+        missing_under_this_ab = sorted(expected_set - found_under_ab)
 
         # Present elsewhere
         present_elsewhere = []
         for t in expected_set:
             if t in train_to_longnames and t not in found_under_ab:
-                present_elsewhere.append(
-                    f"{t} ({' | '.join(sorted(train_to_longnames[t]))})"
-                )
+                present_elsewhere.append(f"{t} ({longnames_joined[t]})")
 
         extra_gtfs = sorted(found_under_ab - expected_set)
 
@@ -210,61 +268,38 @@ def main() -> None:
         else:
             status = "OK"
 
-        results.append(
-            MatchRow(
-                departure=dep,
-                arrival=arr,
-                status=status,
-                expected_trains=", ".join(sorted(expected_set)),
-                found_trains=", ".join(sorted(found_under_ab)),
-                missing_anywhere=", ".join(missing_anywhere),
-                missing_under_this_ab=", ".join(missing_under_this_ab),
-                present_elsewhere=" ; ".join(present_elsewhere),
-                extra_gtfs_trains=", ".join(extra_gtfs),
-            )
+        row = MatchRow(
+            departure=dep,
+            arrival=arr,
+            status=status,
+            expected_trains=sorted_join(expected_set),
+            found_trains=sorted_join(found_under_ab),
+            missing_anywhere=", ".join(missing_anywhere),
+            missing_under_this_ab=", ".join(missing_under_this_ab),
+            present_elsewhere=" ; ".join(present_elsewhere),
+            extra_gtfs_trains=", ".join(extra_gtfs),
         )
+        matched[match_key] = row
+        results.append(row)
 
-    # CSV
+    # CSV + Markdown straight from the MatchRow tuples, each written in bulk
     csv_path = os.path.join(args.out_dir, f"{args.out_prefix}_latest.csv")
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+    with open(csv_path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
         w = csv.writer(f)
-        w.writerow([
-            "departure","arrival","status",
-            "expected_trains","found_trains",
-            "missing_anywhere",
-            "missing_under_this_ab",
-            "present_elsewhere",
-            "extra_gtfs_trains"
-        ])
-        for r in results:
-            w.writerow([
-                r.departure,
-                r.arrival,
-                r.status,
-                r.expected_trains,
-                r.found_trains,
-                r.missing_anywhere,
-                r.missing_under_this_ab,
-                r.present_elsewhere,
-                r.extra_gtfs_trains
-            ])
-
-    # Markdown
+        w.writerow(MATCH_FIELDS)
+        w.writerows(results)
+
     md_path = os.path.join(args.out_dir, f"{args.out_prefix}_latest.md")
-    with open(md_path, "w", encoding="utf-8") as f:
+    with open(md_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write("# Missing routes report\n\n")
         f.write("| departure | arrival | status | expected | found | missing anywhere | missing under this A–B | present elsewhere | extra |\n")
         f.write("|---|---|---|---|---|---|---|---|---|\n")
-
-        for r in results:
-            f.write(
-                f"| {r.departure} | {r.arrival} | {r.status} | "
-                f"{r.expected_trains} | {r.found_trains} | "
-                f"{r.missing_anywhere} | {r.missing_under_this_ab} | "
-                f"{r.present_elsewhere} | {r.extra_gtfs_trains} |\n"
-            )
+        f.writelines([f"| {' | '.join(row)} |\n" for row in results])
 
     print("Report generated.")
+    if args.debug:
+        print(f"norm cache: {norm.cache_info()}")
+        print(f"parse_route_long_name cache: {parse_route_long_name.cache_info()}")
     
 
 if __name__ == "__main__":
@@ -12,15 +12,32 @@ Outputs (in --out-dir):
 - stops_report_<run_utc>.csv
 - stops_report_latest.md
 - stops_report_latest.csv
-- (optional) stop_inventory.json (if --inventory-out provided)
+- (optional) stop_inventory.json (if --inventory-out provided; a .ndjson path selects the append-only
+  line-per-stop format, which only appends changed stops when updated in place, and a .msgpack path
+  a compact binary copy of the JSON mapping)
 """
 
 import argparse
 import csv
+import functools
+import io
 import json
 import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Set, Tuple, List, Optional
+from typing import Dict, Any, Iterable, Set, Tuple, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson isn't installed
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for .msgpack inventories
+    msgpack = None
 
 
 # ---------- IO helpers ----------
@@ -31,26 +48,40 @@ def load_coords_csv(path: str) -> Dict[str, Tuple[str, str]]:
     if not os.path.exists(path):
         return coords
     with open(path, "r", encoding="utf-8", newline="") as f:
-        r = csv.DictReader(f)
+        # Resolve column positions once instead of building a dict per row.
+        # Like DictReader, a repeated header maps to its last column and a missing one reads as "".
+        r = csv.reader(f)
+        col = {h: i for i, h in enumerate(next(r, []))}
+        if "location_name" not in col:
+            return coords
+        ni = col["location_name"]
+        li = col.get("lat")
+        oi = col.get("lon")
+        width = max(ni, li or 0, oi or 0) + 1
         for row in r:
-            name = (row.get("location_name") or "").strip()
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            name = row[ni].strip()
             if not name:
                 continue
-            lat = (row.get("lat") or "").strip()
-            lon = (row.get("lon") or "").strip()
+            lat = row[li].strip() if li is not None else ""
+            lon = row[oi].strip() if oi is not None else ""
             coords[name] = (lat, lon)
     return coords
 
 
 def iter_normalized_files(norm_dir: str):
-    for fn in os.listdir(norm_dir):
-        if fn.endswith(".normalized.json"):
-            yield os.path.join(norm_dir, fn)
+    # scandir hands back the joined path and cached file type with each entry
+    with os.scandir(norm_dir) as it:
+        for e in it:
+            if e.name.endswith(".normalized.json") and e.is_file():
+                yield e.path
 
 
 def load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        data = f.read()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 
 def load_json_optional(path: str) -> Optional[Dict[str, Any]]:
@@ -69,29 +100,80 @@ def write_text(path: str, s: str) -> None:
 
 
 def write_csv(path: str, header: List[str], rows: List[List[str]]) -> None:
+    """
+    Same bytes as csv.writer, but rows whose fields need no quoting (only stop names ever do)
+    are comma-joined directly; the rest go through csv.writer into the same buffer.
+    """
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    buf = io.StringIO()
+    write = buf.write
+    quoted = csv.writer(buf)
+    for row in (header, *rows):
+        line = ",".join(row)
+        if len(row) < 2 or '"' in line or "\n" in line or "\r" in line or line.count(",") != len(row) - 1:
+            quoted.writerow(row)
+        else:
+            write(line)
+            write("\r\n")
     with open(path, "w", encoding="utf-8", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(header)
-        w.writerows(rows)
+        f.write(buf.getvalue())
 
 
 def write_json(path: str, payload: Dict[str, Any]) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
 
+def publish_copy(src: str, dst: str) -> None:
+    """
+    Make dst an identical copy of src without re-serializing: hard link when possible,
+    else a plain file copy. Replaces dst atomically, so an old dst is never written through.
+    """
+    try:
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return  # already linked (same --run-utc re-run); renaming onto the same inode is a no-op
+    except OSError:
+        pass
+    tmp = dst + ".tmp"
+    try:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)  # e.g. no hard link support on this filesystem
+        os.replace(tmp, dst)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+
 # ---------- Time helpers ----------
 
+@functools.lru_cache(maxsize=None)  # inventory entries share a handful of last_seen values
 def parse_run_utc(run_utc: str) -> Optional[datetime]:
     """
     Parse run_utc like 20260220T083254Z -> aware datetime UTC.
     Returns None if parsing fails.
     """
+    # fixed layout: slice the fields instead of going through strptime's format interpreter
+    s = run_utc
+    if len(s) != 16 or s[8] not in "Tt" or s[15] not in "Zz":  # strptime matches literals case-insensitively
+        return None
+    if not (s.isascii() and s[:8].isdigit() and s[9:15].isdigit()):
+        return None
     try:
-        return datetime.strptime(run_utc, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
-    except Exception:
+        return datetime(
+            int(s[0:4]), int(s[4:6]), int(s[6:8]),
+            int(s[9:11]), int(s[11:13]), int(s[13:15]),
+            tzinfo=timezone.utc,
+        )
+    except ValueError:  # out-of-range field, e.g. month 13
         return None
 
 
@@ -110,6 +192,12 @@ def hours_since(now: datetime, past: Optional[datetime]) -> Optional[float]:
 
 # ---------- Domain logic ----------
 
+def sorted_ci(names: Iterable[str]) -> List[str]:
+    """Names sorted case-insensitively (the order every report list uses)."""
+    # sorted() evaluates the key once per element, so the unbound C method is all we need
+    return sorted(names, key=str.casefold)
+
+
 def has_valid_coord(lat: str, lon: str) -> bool:
     try:
         if lat == "" or lon == "":
@@ -121,49 +209,155 @@ def has_valid_coord(lat: str, lon: str) -> bool:
         return False
 
 
-def collect_observed_stops(norm_dir: str) -> Tuple[Set[str], int]:
+def _extract_stop_names(path: str) -> List[str]:
+    """Non-empty stripped stop_name values of one normalized file (runs in a worker process)."""
+    # normalized files are a few KB each: one orjson parse beats an event-streaming parser here
+    stops = load_json(path).get("stops", [])
+    return [name for name in ((s.get("stop_name") or "").strip() for s in stops) if name]
+
+
+def collect_observed_stops(norm_dir: str, jobs: int = 0) -> Tuple[Set[str], int]:
     """
     Collect unique stop_name values from normalized JSON files in a run directory.
+    Files are parsed in parallel (jobs processes, 0 = CPU count); results are merged in file order.
     Returns (observed_stop_names, normalized_files_count).
     """
     observed: Set[str] = set()
     trains_ok = 0
 
-    for path in iter_normalized_files(norm_dir):
-        trains_ok += 1
-        data = load_json(path)
-        for s in data.get("stops", []):
-            name = (s.get("stop_name") or "").strip()
-            if name:
-                observed.add(name)
+    paths = list(iter_normalized_files(norm_dir))
+    if not paths:
+        return observed, trains_ok
+
+    # names come back from the workers as fresh copies; interning them lets the observed set
+    # and the inventory keys (interned on load) share a single object per stop
+    intern = sys.intern
+    with ProcessPoolExecutor(max_workers=jobs or None) as ex:
+        for names in ex.map(_extract_stop_names, paths, chunksize=16):
+            trains_ok += 1
+            observed.update(map(intern, names))
 
     return observed, trains_ok
 
 
+def _inventory_entry(v: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "first_seen_utc": str(v.get("first_seen_utc") or ""),
+        "last_seen_utc": str(v.get("last_seen_utc") or ""),
+        "seen_count": int(v.get("seen_count") or 0),
+    }
+
+
 def load_inventory(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
     """
     Inventory format:
       {
         "<Stop Name>": {"first_seen_utc": "...", "last_seen_utc": "...", "seen_count": 3}
       }
+    Paths ending in .ndjson use the line-per-stop format instead (see load_inventory_ndjson);
+    paths ending in .msgpack hold the same mapping as binary MessagePack (needs the msgpack package).
     """
     if not path:
         return {}
-    payload = load_json_optional(path)
+    if path.endswith(".ndjson"):
+        return load_inventory_ndjson(path)
+    if path.endswith(".msgpack"):
+        payload = load_msgpack_optional(path)
+    else:
+        payload = load_json_optional(path)
     if not payload or not isinstance(payload, dict):
         return {}
     inv: Dict[str, Dict[str, Any]] = {}
     for k, v in payload.items():
         if not isinstance(k, str) or not isinstance(v, dict):
             continue
-        inv[k] = {
-            "first_seen_utc": str(v.get("first_seen_utc") or ""),
-            "last_seen_utc": str(v.get("last_seen_utc") or ""),
-            "seen_count": int(v.get("seen_count") or 0),
-        }
+        inv[sys.intern(k)] = _inventory_entry(v)
+    return inv
+
+
+def load_inventory_ndjson(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    NDJSON inventory: one {"name": "<Stop Name>", "first_seen_utc": ..., "last_seen_utc": ..., "seen_count": ...}
+    object per line. Updates are appended, so a later line for the same name wins.
+    """
+    inv: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return inv
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = loads(line)
+            except ValueError:
+                continue  # e.g. a torn last line from an interrupted append
+            if not isinstance(rec, dict) or not isinstance(rec.get("name"), str):
+                continue
+            inv[sys.intern(rec["name"])] = _inventory_entry(rec)
     return inv
 
 
+def _require_msgpack() -> None:
+    if msgpack is None:
+        raise SystemExit("A .msgpack inventory needs the msgpack package (pip install msgpack)")
+
+
+def load_msgpack_optional(path: str) -> Optional[Dict[str, Any]]:
+    _require_msgpack()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read(), raw=False)
+    except Exception:
+        return None
+
+
+def _ndjson_line(name: str, entry: Dict[str, Any]) -> bytes:
+    rec = {"name": name, **entry}
+    if orjson is not None:
+        return orjson.dumps(rec) + b"\n"
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def write_inventory(path: str, inventory: Dict[str, Dict[str, Any]], changed: Set[str], in_place: bool) -> None:
+    """
+    Write the inventory to path (.json: full rewrite, as before; .msgpack: full rewrite as MessagePack;
+    .ndjson: see below).
+    For an NDJSON inventory updated in place, only the changed entries are appended. The file is compacted
+    (rewritten with one line per stop) when more than 20% of the stops changed, or when appends have
+    grown it past twice its compact size.
+    """
+    if path.endswith(".msgpack"):
+        _require_msgpack()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(msgpack.packb(inventory, use_bin_type=True))
+        os.replace(tmp, path)
+        return
+    if not path.endswith(".ndjson"):
+        write_json(path, inventory)
+        return
+
+    if in_place and os.path.exists(path):
+        if not changed:
+            return
+        appended = b"".join(_ndjson_line(name, inventory[name]) for name in changed)
+        compact_estimate = len(inventory) * len(appended) / len(changed)
+        if len(changed) <= 0.2 * len(inventory) and os.path.getsize(path) + len(appended) <= 2 * compact_estimate:
+            with open(path, "ab") as f:
+                f.write(appended)
+            return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"".join(_ndjson_line(name, entry) for name, entry in inventory.items()))
+    os.replace(tmp, path)  # never leave a half-written inventory behind
+
+
 def merge_inventory(
     inventory: Dict[str, Dict[str, Any]],
     observed: Set[str],
@@ -172,11 +366,16 @@ def merge_inventory(
     """
     Merge observed stops from current run into inventory, updating first_seen/last_seen and seen_count.
     """
+    # cold start: every observed stop is new
+    if not inventory:
+        return {name: {"first_seen_utc": run_utc, "last_seen_utc": run_utc, "seen_count": 1} for name in observed}
+
+    get = inventory.get
     for name in observed:
-        if name not in inventory:
+        entry = get(name)
+        if entry is None:
             inventory[name] = {"first_seen_utc": run_utc, "last_seen_utc": run_utc, "seen_count": 1}
         else:
-            entry = inventory[name]
             if not entry.get("first_seen_utc"):
                 entry["first_seen_utc"] = run_utc
             entry["last_seen_utc"] = run_utc
@@ -184,52 +383,94 @@ def merge_inventory(
     return inventory
 
 
+def compute_stale(
+    inventory: Dict[str, Dict[str, Any]],
+    now_utc: datetime,
+    window_hours: int,
+) -> Dict[str, bool]:
+    """name -> True when the stop wasn't seen within window_hours of now_utc (or has no usable last_seen)."""
+    stale: Dict[str, bool] = {}
+    for name, entry in inventory.items():
+        hs = hours_since(now_utc, parse_run_utc(str(entry.get("last_seen_utc") or "")))
+        stale[name] = hs is None or hs > window_hours
+    return stale
+
+
 def categorize_against_inventory(
     coords: Dict[str, Tuple[str, str]],
     inventory: Dict[str, Dict[str, Any]],
-    now_utc: datetime,
-    window_hours: Optional[int],
-) -> Dict[str, List[str]]:
+    stale_by_name: Optional[Dict[str, bool]],
+    valid: Dict[str, bool],
+    ordered: List[str],
+    coords_ordered: List[str],
+) -> Tuple[Dict[str, List[str]], List[List[str]]]:
     """
-    Categorize using cumulative inventory.
+    Categorize using cumulative inventory and build the CSV rows for ALL inventory stops, in one pass.
+    ordered / coords_ordered are the inventory / coordinates.csv names sorted case-insensitively;
+    stale_by_name comes from compute_stale (None when no staleness window is used).
 
-    Returns dict with keys:
+    Returns (categories, rows). categories has keys:
       - has_coordinates
       - missing_coordinates
       - new_not_in_coordinates  (in inventory but not in coordinates.csv)
       - unused_in_coordinates   (in coordinates.csv but never seen in inventory)
       - stale_inventory         (in inventory but not seen within window_hours) [optional]
+    rows columns:
+      location_name, status, lat, lon, first_seen_utc, last_seen_utc, seen_count, stale
     """
-    inv_names = set(inventory.keys())
-    coord_names = set(coords.keys())
-
     has_coords: List[str] = []
     missing_coords: List[str] = []
     new_not_in_coords: List[str] = []
-    unused_in_coords: List[str] = []
     stale: List[str] = []
+    rows: List[List[str]] = []
+
+    # hot per-stop loop: bind lookups and appends as locals once
+    _str, _int = str, int
+    inv_get = inventory.__getitem__
+    coord_get = coords.get
+    is_valid = valid.__getitem__
+    add_row = rows.append
+    add_new = new_not_in_coords.append
+    add_has = has_coords.append
+    add_missing = missing_coords.append
+    add_stale = stale.append
+    is_stale = stale_by_name.__getitem__ if stale_by_name is not None else None
 
     # Inventory -> coords coverage
-    for name in sorted(inv_names, key=lambda x: x.casefold()):
-        if name not in coords:
-            new_not_in_coords.append(name)
+    for name in ordered:
+        entry = inv_get(name)
+        eget = entry.get
+        first_seen = _str(eget("first_seen_utc") or "")
+        last_seen = _str(eget("last_seen_utc") or "")
+        seen_count = _str(_int(eget("seen_count") or 0))
+
+        c = coord_get(name)
+        if c is None:
+            add_new(name)
+            status = "NEW_NOT_IN_COORDINATES"
+            lat = lon = ""
         else:
-            lat, lon = coords[name]
-            if has_valid_coord(lat, lon):
-                has_coords.append(name)
+            lat, lon = c
+            if is_valid(name):
+                add_has(name)
+                status = "HAS_COORDINATES"
             else:
-                missing_coords.append(name)
+                add_missing(name)
+                status = "MISSING_COORDINATES"
 
         # stale check
-        if window_hours is not None:
-            last_seen = parse_run_utc(str(inventory[name].get("last_seen_utc") or ""))
-            hs = hours_since(now_utc, last_seen)
-            if hs is None or hs > window_hours:
-                stale.append(name)
+        stale_flag = ""
+        if is_stale is not None:
+            if is_stale(name):
+                add_stale(name)
+                stale_flag = "YES"
+            else:
+                stale_flag = "NO"
+
+        add_row([name, status, lat, lon, first_seen, last_seen, seen_count, stale_flag])
 
-    # Coords entries never seen in inventory
-    for name in sorted(coord_names - inv_names, key=lambda x: x.casefold()):
-        unused_in_coords.append(name)
+    # Coords entries never seen in inventory (coords_ordered is already sorted, so just filter it)
+    unused_in_coords = [name for name in coords_ordered if name not in inventory]
 
     out: Dict[str, List[str]] = {
         "has_coordinates": has_coords,
@@ -237,44 +478,9 @@ def categorize_against_inventory(
         "new_not_in_coordinates": new_not_in_coords,
         "unused_in_coordinates": unused_in_coords,
     }
-    if window_hours is not None:
+    if stale_by_name is not None:
         out["stale_inventory"] = stale
-    return out
-
-
-def build_rows_from_inventory(
-    coords: Dict[str, Tuple[str, str]],
-    inventory: Dict[str, Dict[str, Any]],
-    window_hours: Optional[int],
-    now_utc: datetime,
-) -> List[List[str]]:
-    """
-    Build CSV rows for ALL inventory stops.
-    Columns:
-      location_name, status, lat, lon, first_seen_utc, last_seen_utc, seen_count, stale
-    """
-    rows: List[List[str]] = []
-    for name in sorted(inventory.keys(), key=lambda x: x.casefold()):
-        entry = inventory[name]
-        first_seen = str(entry.get("first_seen_utc") or "")
-        last_seen = str(entry.get("last_seen_utc") or "")
-        seen_count = str(int(entry.get("seen_count") or 0))
-
-        lat = lon = ""
-        if name in coords:
-            lat, lon = coords[name]
-            status = "HAS_COORDINATES" if has_valid_coord(lat, lon) else "MISSING_COORDINATES"
-        else:
-            status = "NEW_NOT_IN_COORDINATES"
-
-        stale_flag = ""
-        if window_hours is not None:
-            last_dt = parse_run_utc(last_seen)
-            hs = hours_since(now_utc, last_dt)
-            stale_flag = "YES" if (hs is None or hs > window_hours) else "NO"
-
-        rows.append([name, status, lat, lon, first_seen, last_seen, seen_count, stale_flag])
-    return rows
+    return out, rows
 
 
 # ---------- Main ----------
@@ -294,10 +500,12 @@ def main() -> None:
     ap.add_argument("--window-hours", type=int, default=0,
                     help="If >0, mark inventory stops as stale when not seen within this many hours (e.g. 168 for 7 days).")
 
+    ap.add_argument("--jobs", type=int, default=0, help="Processes used to parse normalized files (default: CPU count)")
+
     args = ap.parse_args()
 
     coords = load_coords_csv(args.coordinates)
-    observed, trains_ok = collect_observed_stops(args.normalized_dir)
+    observed, trains_ok = collect_observed_stops(args.normalized_dir, args.jobs)
 
     # Determine now based on run_utc if possible; else current UTC
     run_dt = parse_run_utc(args.run_utc)
@@ -313,7 +521,9 @@ def main() -> None:
     if use_inventory:
         inventory = merge_inventory(inventory, observed, args.run_utc)
         if inventory_out:
-            write_json(inventory_out, inventory)
+            # every observed stop got its last_seen/seen_count bumped; nothing else changed
+            in_place = bool(inventory_in) and os.path.realpath(inventory_in) == os.path.realpath(inventory_out)
+            write_inventory(inventory_out, inventory, observed, in_place)
 
     window_hours: Optional[int] = args.window_hours if args.window_hours and args.window_hours > 0 else None
 
@@ -322,10 +532,20 @@ def main() -> None:
         # synthesize inventory from observed for consistent reporting outputs
         inventory = {name: {"first_seen_utc": args.run_utc, "last_seen_utc": args.run_utc, "seen_count": 1} for name in observed}
 
-    cats = categorize_against_inventory(coords, inventory, now_utc, window_hours)
+    # validate each coordinate pair once; the report pass below looks it up by name
+    valid = {name: has_valid_coord(lat, lon) for name, (lat, lon) in coords.items()}
+    coords_ordered = sorted_ci(coords)
+
+    # sort the inventory once (case-insensitive); the report pass below walks it in this order
+    ordered = sorted_ci(inventory)
+
+    # staleness per stop, computed once up front
+    stale_by_name = compute_stale(inventory, now_utc, window_hours) if window_hours is not None else None
 
-    # Build CSV for inventory stops
-    rows = build_rows_from_inventory(coords, inventory, window_hours, now_utc)
+    # Categories + CSV rows for inventory stops
+    cats, rows = categorize_against_inventory(
+        coords, inventory, stale_by_name, valid, ordered, coords_ordered
+    )
 
     out_dir = args.out_dir
     os.makedirs(out_dir, exist_ok=True)
@@ -337,37 +557,37 @@ def main() -> None:
 
     csv_header = ["location_name", "status", "lat", "lon", "first_seen_utc", "last_seen_utc", "seen_count", "stale"]
     write_csv(dated_csv, csv_header, rows)
-    write_csv(latest_csv, csv_header, rows)
+    publish_copy(dated_csv, latest_csv)
 
     # Markdown summary
-    md: List[str] = []
-    md.append("# Italo stops coordinates report\n\n")
-    md.append(f"- Run: `{args.run_utc}`\n")
-    md.append(f"- Normalized trains (ok): **{trains_ok}**\n")
-    md.append(f"- Unique stops observed in this run: **{len(observed)}**\n")
-    md.append(f"- Unique stops in inventory: **{len(inventory)}**\n")
-    md.append(f"- Stops with coordinates: **{len(cats['has_coordinates'])}**\n")
-    md.append(f"- Stops missing coordinates: **{len(cats['missing_coordinates'])}**\n")
-    md.append(f"- New stops not in coordinates.csv: **{len(cats['new_not_in_coordinates'])}**\n")
-    md.append(f"- Unused entries in coordinates.csv (never seen in inventory): **{len(cats['unused_in_coordinates'])}**\n")
+    buf = io.StringIO()
+    w = buf.write
+    w("# Italo stops coordinates report\n\n")
+    w(f"- Run: `{args.run_utc}`\n")
+    w(f"- Normalized trains (ok): **{trains_ok}**\n")
+    w(f"- Unique stops observed in this run: **{len(observed)}**\n")
+    w(f"- Unique stops in inventory: **{len(inventory)}**\n")
+    w(f"- Stops with coordinates: **{len(cats['has_coordinates'])}**\n")
+    w(f"- Stops missing coordinates: **{len(cats['missing_coordinates'])}**\n")
+    w(f"- New stops not in coordinates.csv: **{len(cats['new_not_in_coordinates'])}**\n")
+    w(f"- Unused entries in coordinates.csv (never seen in inventory): **{len(cats['unused_in_coordinates'])}**\n")
     if window_hours is not None and "stale_inventory" in cats:
-        md.append(f"- Stale inventory stops (not seen in last {window_hours}h): **{len(cats['stale_inventory'])}**\n")
+        w(f"- Stale inventory stops (not seen in last {window_hours}h): **{len(cats['stale_inventory'])}**\n")
 
     if use_inventory:
-        md.append("\n_This report is **cumulative** (uses stop_inventory.json)._\n")
+        w("\n_This report is **cumulative** (uses stop_inventory.json)._\n")
     else:
-        md.append("\n_This report is **per-run** (no inventory provided)._\n")
+        w("\n_This report is **per-run** (no inventory provided)._\n")
 
     def section(title: str, items: List[str], limit: int = 200) -> None:
-        md.append(f"\n## {title} ({len(items)})\n")
+        w(f"\n## {title} ({len(items)})\n")
         if not items:
-            md.append("_None_\n")
+            w("_None_\n")
             return
         if len(items) > limit:
-            md.append(f"_Showing first {limit} only. See CSV for full list._\n")
+            w(f"_Showing first {limit} only. See CSV for full list._\n")
             items = items[:limit]
-        for x in items:
-            md.append(f"- {x}\n")
+        w("- " + "\n- ".join(items) + "\n")
 
     section("Missing coordinates", cats["missing_coordinates"])
     section("New stops not in coordinates.csv", cats["new_not_in_coordinates"])
@@ -376,8 +596,9 @@ def main() -> None:
         section(f"Stale inventory (not seen within {window_hours} hours)", cats["stale_inventory"])
     section("Has coordinates", cats["has_coordinates"], limit=100)
 
-    write_text(dated_md, "".join(md))
-    write_text(latest_md, "".join(md))
+    md_text = buf.getvalue()
+    write_text(dated_md, md_text)
+    publish_copy(dated_md, latest_md)
 
     print(f"Wrote {dated_md}")
     print(f"Wrote {dated_csv}")